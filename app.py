@@ -9,11 +9,16 @@ Commands:
   - return-loan
   - report-loans
   - stats
+  - batch
 
 """
 from __future__ import annotations
 import argparse
-from datetime import datetime
+import csv
+import json
+import sqlite3
+import sys
+from datetime import date, datetime
 from pathlib import Path
 from typing import Optional
 
@@ -23,9 +28,9 @@ DB_DEFAULT = Path("./data/library.db")
 
 
 def cmd_init(args: argparse.Namespace) -> None:
-    db = Database(args.db)
-    db.create_tables()
-    db.close()
+    Database.ensure_path(args.db)
+    with Database(args.db) as db:
+        db.create_tables()
     print(f"initialized database at {db.path}")
 
 
@@ -36,53 +41,46 @@ def cmd_seed(args: argparse.Namespace) -> None:
 
 
 def cmd_list_books(args: argparse.Namespace) -> None:
-    db = Database(args.db)
-    books = db.get_books(title_like=args.filter)
-    for b in books:
-        print(f"{b.id:3}  {b.title:<40}  {b.author:<20}  qty={b.qty}")
-    db.close()
+    with Database(args.db) as db:
+        books = db.get_books(title_like=args.filter)
+        if books:
+            sys.stdout.write("\n".join(f"{b.id:3}  {b.title:<40}  {b.author:<20}  qty={b.qty}" for b in books) + "\n")
 
 
 def cmd_add_book(args: argparse.Namespace) -> None:
-    db = Database(args.db)
-    book_id = db.add_book(args.title, args.author, args.qty)
+    with Database(args.db) as db:
+        book_id = db.add_book(args.title, args.author, args.qty)
     print(f"added book id={book_id}")
-    db.close()
 
 
 def cmd_loan_book(args: argparse.Namespace) -> None:
-    db = Database(args.db)
-    loan_id = db.loan_book(args.book_id, args.borrower, loan_date=args.date)
+    with Database(args.db) as db:
+        loan_id = db.loan_book(args.book_id, args.borrower, loan_date=args.date)
     print(f"loan created id={loan_id}")
-    db.close()
 
 
 def cmd_return_loan(args: argparse.Namespace) -> None:
-    db = Database(args.db)
-    db.return_loan(args.loan_id, return_date=args.date)
+    with Database(args.db) as db:
+        db.return_loan(args.loan_id, return_date=args.date)
     print(f"loan {args.loan_id} marked returned")
-    db.close()
 
 
 def cmd_report_loans(args: argparse.Namespace) -> None:
-    db = Database(args.db)
-    rows = db.loans_in_date_range(args.from_date, args.to_date)
-    if not rows:
-        print("no loans in range")
-    for r in rows:
-        print(f"{r['id']:3}  {r['title']:<40}  {r['borrower']:<15}  {r['loan_date']} -> {r['return_date']}")
-    db.close()
+    with Database(args.db) as db:
+        rows = db.loans_in_date_range(args.from_date, args.to_date)
+        if not rows:
+            print("no loans in range")
+        else:
+            sys.stdout.write("\n".join(f"{r['id']:3}  {r['title']:<40}  {r['borrower']:<15}  {r['loan_date']} -> {r['return_date']}" for r in rows) + "\n")
 
 
 def cmd_stats(args: argparse.Namespace) -> None:
-    db = Database(args.db)
-    counts = db.book_loan_counts()
-    total, avg = db.loan_aggregates()
-    print(f"total loans: {total}, avg loans/book: {avg:.2f}\n")
-    print("Top books by times loaned:")
-    for book_id, title, author, times in counts:
-        print(f"{times:3}  {title:<40}  {author}")
-    db.close()
+    with Database(args.db) as db:
+        counts = db.book_loan_counts(limit=args.limit)
+        total, avg = db.loan_aggregates()
+        lines = [f"total loans: {total}, avg loans/book: {avg:.2f}", "", "Top books by times loaned:"]
+        lines.extend(f"{times:3}  {title:<40}  {author}" for _book_id, title, author, times in counts)
+        sys.stdout.write("\n".join(lines) + "\n")
 
 
 def _confirm(prompt: str, assume_yes: bool) -> bool:
@@ -93,40 +91,139 @@ def _confirm(prompt: str, assume_yes: bool) -> bool:
 
 
 def cmd_update_book(args: argparse.Namespace) -> None:
-    db = Database(args.db)
-    db.update_book(args.book_id, title=args.title, author_name=args.author, qty=args.qty)
+    with Database(args.db) as db:
+        db.update_book(args.book_id, title=args.title, author_name=args.author, qty=args.qty)
     print(f"updated book id={args.book_id}")
-    db.close()
 
 
 def cmd_delete_book(args: argparse.Namespace) -> None:
     if not _confirm(f"Delete book id={args.book_id}? This will remove associated loans.", args.yes):
         print("aborted")
         return
-    db = Database(args.db)
-    db.delete_book(args.book_id)
+    with Database(args.db) as db:
+        db.delete_book(args.book_id)
     print(f"deleted book id={args.book_id}")
-    db.close()
 
 
 def cmd_update_loan(args: argparse.Namespace) -> None:
-    db = Database(args.db)
-    db.return_loan(args.loan_id, return_date=args.return_date) if args.return_date else None
-    if args.borrower:
-        db.conn.execute("UPDATE loans SET borrower = ? WHERE id = ?", (args.borrower, args.loan_id))
-        db.conn.commit()
+    with Database(args.db) as db:
+        db.return_loan(args.loan_id, return_date=args.return_date) if args.return_date else None
+        if args.borrower:
+            db.conn.execute("UPDATE loans SET borrower = ? WHERE id = ?", (args.borrower, args.loan_id))
     print(f"updated loan id={args.loan_id}")
-    db.close()
 
 
 def cmd_delete_loan(args: argparse.Namespace) -> None:
     if not _confirm(f"Delete loan id={args.loan_id}?", args.yes):
         print("aborted")
         return
-    db = Database(args.db)
-    db.delete_loan(args.loan_id)
+    with Database(args.db) as db:
+        db.delete_loan(args.loan_id)
     print(f"deleted loan id={args.loan_id}")
-    db.close()
+
+
+# Keys each batch operation must carry; "qty" and "date" are optional.
+_BATCH_REQUIRED = {
+    "add-book": ("title", "author"),
+    "loan-book": ("book_id", "borrower"),
+    "return-loan": ("loan_id",),
+}
+_BATCH_STR_KEYS = ("title", "author", "borrower")
+_BATCH_INT_KEYS = ("qty", "book_id", "loan_id")
+
+
+def _check_batch_op(op: dict) -> dict:
+    """Return op with ints and dates parsed; CSV cells arrive as strings, JSON values as-is."""
+    checked = dict(op)
+    for key in _BATCH_STR_KEYS:
+        if key in op and not (isinstance(op[key], str) and op[key]):
+            raise ValueError(f"{key!r} must be a non-empty string")
+    for key in _BATCH_INT_KEYS:
+        if key not in op:
+            continue
+        value = op[key]
+        if isinstance(value, str):
+            try:
+                value = int(value)
+            except ValueError:
+                value = None
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError(f"{key!r} must be an integer")
+        checked[key] = value
+    if checked.get("qty", 1) < 1:
+        raise ValueError("'qty' must be >= 1")
+    if "date" in op:
+        if not isinstance(op["date"], str):
+            raise ValueError("'date' must be an ISO date string")
+        try:
+            checked["date"] = date.fromisoformat(op["date"])
+        except ValueError:
+            raise ValueError(f"'date' must be an ISO date string, got {op['date']!r}") from None
+    return checked
+
+
+def _read_batch(path: Path) -> list[dict]:
+    """Load and check batch operations from a JSON list of objects or a CSV file with a header row."""
+    with open(path, newline="", encoding="utf-8") as fh:
+        if path.suffix.lower() == ".csv":
+            # empty CSV cells mean "not given", like a missing JSON key
+            ops = [{k: v for k, v in row.items() if v not in (None, "")} for row in csv.DictReader(fh)]
+        else:
+            try:
+                ops = json.load(fh)
+            except json.JSONDecodeError as exc:
+                raise SystemExit(f"{path}: invalid JSON: {exc}") from exc
+    if not isinstance(ops, list):
+        raise SystemExit(f"{path}: expected a list of operations")
+    checked = []
+    for n, op in enumerate(ops, start=1):
+        if not isinstance(op, dict):
+            raise SystemExit(f"{path}: operation {n}: expected an object")
+        kind = op.get("op")
+        if kind not in _BATCH_REQUIRED:
+            raise SystemExit(f"{path}: operation {n}: unknown op {kind!r}")
+        for key in _BATCH_REQUIRED[kind]:
+            if key not in op:
+                raise SystemExit(f"{path}: operation {n}: missing {key!r}")
+        try:
+            checked.append(_check_batch_op(op))
+        except ValueError as exc:
+            raise SystemExit(f"{path}: operation {n}: {exc}") from exc
+    return checked
+
+
+def _flush_books(db: Database, books: list[tuple[str, str, int]]) -> int:
+    if not books:
+        return 0
+    added = len(db.add_books_bulk(books))
+    books.clear()
+    return added
+
+
+def cmd_batch(args: argparse.Namespace) -> None:
+    ops = _read_batch(args.file)
+    books: list[tuple[str, str, int]] = []  # consecutive add-book ops, written with one add_books_bulk
+    added = loaned = returned = 0
+    with Database(args.db) as db:
+        for n, op in enumerate(ops, start=1):
+            kind = op["op"]
+            try:
+                if kind == "add-book":
+                    books.append((op["title"], op["author"], op.get("qty", 1)))
+                    continue
+                # keep file order: later ops may refer to books added just before them
+                added += _flush_books(db, books)
+                if kind == "loan-book":
+                    db.loan_book(op["book_id"], op["borrower"], loan_date=op.get("date"))
+                    loaned += 1
+                else:
+                    db.return_loan(op["loan_id"], return_date=op.get("date"))
+                    returned += 1
+            except (ValueError, TypeError, sqlite3.Error) as exc:
+                # leaving the with-block via SystemExit rolls the whole batch back
+                raise SystemExit(f"{args.file}: operation {n}: {exc}") from exc
+        added += _flush_books(db, books)
+    print(f"batch applied: {added} books added, {loaned} loans, {returned} returns")
 
 
 def make_parser() -> argparse.ArgumentParser:
@@ -155,8 +252,8 @@ def make_parser() -> argparse.ArgumentParser:
     ret.add_argument("--date", type=lambda s: datetime.fromisoformat(s).date(), required=False)
 
     rep = sub.add_parser("report-loans")
-    rep.add_argument("--from", dest="from_date", required=True)
-    rep.add_argument("--to", dest="to_date", required=True)
+    rep.add_argument("--from", dest="from_date", type=lambda s: datetime.fromisoformat(s).date(), required=True)
+    rep.add_argument("--to", dest="to_date", type=lambda s: datetime.fromisoformat(s).date(), required=True)
 
     u = sub.add_parser("update-book")
     u.add_argument("--book-id", type=int, required=True)
@@ -177,7 +274,11 @@ def make_parser() -> argparse.ArgumentParser:
     dl.add_argument("--loan-id", type=int, required=True)
     dl.add_argument("--yes", action="store_true", dest="yes", help="assume yes")
 
-    sub.add_parser("stats")
+    st = sub.add_parser("stats")
+    st.add_argument("--limit", type=int, default=20, help="number of top books to show (-1 for all)")
+
+    bt = sub.add_parser("batch", help="apply add-book/loan-book/return-loan ops from a JSON or CSV file in one transaction")
+    bt.add_argument("file", type=Path)
     return p
 
 
@@ -200,6 +301,7 @@ def main(argv: Optional[list[str]] = None) -> None:
         "return-loan": cmd_return_loan,
         "report-loans": cmd_report_loans,
         "stats": cmd_stats,
+        "batch": cmd_batch,
     }[args.cmd](args)
 
 
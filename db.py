@@ -4,14 +4,106 @@ Provides: schema creation, CRUD operations, join query, aggregates, and date-ran
 """
 from __future__ import annotations
 import sqlite3
+from collections import Counter
+from contextlib import contextmanager
 from dataclasses import dataclass
-from datetime import date
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Sequence, Tuple
 
 DEFAULT_DB = Path("./data/library.db")
 
-@dataclass
+# Bind date objects as ISO strings in the driver, so callers (and executemany) pass dates as-is.
+sqlite3.register_adapter(date, date.isoformat)
+
+# Rows per multi-row INSERT; 300 * 3 params stays under SQLite's default 999-variable limit.
+BULK_CHUNK = 300
+
+# Prepared statements kept per connection (sqlite3's default is 128).
+CACHED_STATEMENTS = 256
+
+# Fixed statements live at module level so every call passes identical SQL text and hits the
+# connection's prepared-statement cache (see CACHED_STATEMENTS).
+# authors is WITHOUT ROWID, so ids come from MAX(id) + 1 (a seek on the UNIQUE(id) index).
+_SQL_NEXT_AUTHOR_ID = "(SELECT COALESCE(MAX(id), 0) + 1 FROM authors)"
+# The no-op DO UPDATE makes RETURNING yield the id on the conflict path too.
+_SQL_UPSERT_AUTHOR = (
+    "INSERT INTO authors (id, name) VALUES (" + _SQL_NEXT_AUTHOR_ID + ", ?) "
+    "ON CONFLICT(name) DO UPDATE SET name = excluded.name RETURNING id"
+)
+_SQL_ADD_BOOK = "INSERT INTO books (title, author, qty) VALUES (?,?,?)"
+_SQL_BOOK_QTY_DELTA = "UPDATE books SET qty = qty + ? WHERE id = ?"
+_SQL_DELETE_BOOK = "DELETE FROM books WHERE id = ?"
+_SQL_GET_BOOKS = "SELECT id, title, author, qty FROM books"
+# Filters are escaped (see _like_substring) so LIKE matches the same literal substrings as MATCH.
+_SQL_GET_BOOKS_LIKE = _SQL_GET_BOOKS + " WHERE title LIKE ? ESCAPE '\\'"
+_SQL_HAS_FTS = "SELECT 1 FROM sqlite_master WHERE name = 'books_fts'"
+# Trigram FTS index lookup instead of a full scan for substring search on titles.
+_SQL_GET_BOOKS_MATCH = (
+    "SELECT b.id, b.title, b.author, b.qty FROM books_fts f JOIN books b ON b.id = f.rowid "
+    "WHERE books_fts MATCH ?"
+)
+_SQL_BOOK_EXISTS = "SELECT 1 FROM books WHERE id = ?"
+_SQL_LOAN_TAKE_COPY = "UPDATE books SET qty = qty - 1 WHERE id = ? AND qty > 0 RETURNING id"
+_SQL_LOAN_INSERT = "INSERT INTO loans (book_id, borrower, loan_date) VALUES (?,?,?)"
+_SQL_LOAN_RETURN = "UPDATE loans SET return_date = ? WHERE id = ? AND return_date IS NULL RETURNING book_id"
+_SQL_LOAN_EXISTS = "SELECT 1 FROM loans WHERE id = ?"
+_SQL_DELETE_LOAN = "DELETE FROM loans WHERE id = ?"
+# The correlated COUNT walks ix_loans_book_id per book
+# (EXPLAIN QUERY PLAN: SEARCH loans USING COVERING INDEX ix_loans_book_id (book_id=?)),
+# so no grouped intermediate is built.
+_SQL_BOOK_LOAN_COUNTS = """
+    SELECT b.id AS book_id, b.title, b.author,
+           (SELECT COUNT(*) FROM loans WHERE book_id = b.id) AS times_loaned
+    FROM books b
+    ORDER BY times_loaned DESC, b.id
+    LIMIT ?
+"""
+_SQL_LOAN_AGGREGATES = "SELECT COUNT(*), CAST(COUNT(*) AS REAL) / NULLIF(COUNT(DISTINCT book_id), 0) FROM loans"
+
+# Half-open range on the bare loan_date column so ix_loans_loan_date stays usable;
+# EXPLAIN QUERY PLAN: SEARCH l USING INDEX ix_loans_loan_date (loan_date>? AND loan_date<?).
+_SQL_LOANS_IN_RANGE = (
+    "SELECT l.id, b.title, l.borrower, l.loan_date, l.return_date FROM loans l JOIN books b ON b.id = l.book_id "
+    "WHERE l.loan_date >= ? AND l.loan_date < ? ORDER BY l.loan_date"
+)
+
+# Table definitions shared by create_tables and the author_id schema migration.
+# authors is clustered on name (the lookup key); its id is assigned by the insert statements.
+_DDL_AUTHORS = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL PRIMARY KEY,
+    UNIQUE(id)
+) WITHOUT ROWID, STRICT;
+"""
+# author is stored on the book itself so reads need no join; authors is kept as the
+# distinct-author dimension by the trg_books_author_* triggers.
+_DDL_BOOKS = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    author TEXT NOT NULL,
+    qty INTEGER NOT NULL DEFAULT 1
+);
+"""
+
+
+def _like_substring(text: str) -> str:
+    """Pattern matching `text` literally anywhere in a value, for `LIKE ? ESCAPE '\\'`."""
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _as_date(value: str | date) -> date:
+    """Normalise an ISO string, date or datetime to a plain date (datetimes would bind with a time part)."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+@dataclass(slots=True)
 class Book:
     id: int
     title: str
@@ -20,30 +112,79 @@ class Book:
 
 
 class Database:
+    # WAL + synchronous=NORMAL: one fsync per checkpoint instead of two per commit, and readers
+    # never block the writer. Set to False (e.g. on a subclass) to keep the rollback journal.
+    USE_WAL = True
+    # True while inside `with Database(...) as db:`; write methods then join that one transaction
+    _in_block = False
+    # Whether books_fts exists; set by _create_fts, or looked up on the first title search
+    has_fts: Optional[bool] = None
+
     def __init__(self, path: Optional[Path] = None):
         self.path = Path(path or DEFAULT_DB)
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(str(self.path))
-        self.conn.row_factory = sqlite3.Row
+        self.conn = sqlite3.connect(str(self.path), cached_statements=CACHED_STATEMENTS)
+        self.configure(self.conn)
+
+    @classmethod
+    def ensure_path(cls, path: Optional[Path] = None) -> None:
+        """Create the database's parent directory; call once at startup, not per connection."""
+        Path(path or DEFAULT_DB).parent.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def configure(cls, conn: sqlite3.Connection) -> None:
+        """Apply the per-connection settings every connection to the catalog should have."""
+        conn.row_factory = sqlite3.Row
+        if cls.USE_WAL:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA mmap_size = 268435456")
+        conn.execute("PRAGMA cache_size = -65536")
+        # per-connection and a no-op inside a transaction, so it lives here rather than in create_tables
+        conn.execute("PRAGMA foreign_keys = ON")
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection, path: Optional[Path] = None, has_fts: Optional[bool] = None) -> "Database":
+        """Wrap an already-open connection (e.g. a pooled one) without reconnecting.
+
+        Pass `has_fts` from an earlier create_tables to skip the per-instance books_fts lookup.
+        """
+        db = cls.__new__(cls)
+        db.path = Path(path or DEFAULT_DB)
+        db.conn = conn
+        db.has_fts = has_fts
+        return db
 
     def close(self) -> None:
         self.conn.close()
 
+    def __enter__(self) -> "Database":
+        self._in_block = True
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._in_block = False
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.close()
+
+    @contextmanager
+    def _write(self) -> Iterator[None]:
+        """Transaction for a single write method, or a no-op inside an outer `with Database(...)` block."""
+        if self._in_block:
+            yield
+        else:
+            with self.conn:
+                yield
+
     def create_tables(self) -> None:
+        self._migrate_author_id_schema()
         cur = self.conn.cursor()
-        cur.executescript("""
-        PRAGMA foreign_keys = ON;
-        CREATE TABLE IF NOT EXISTS authors (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE
-        );
-        CREATE TABLE IF NOT EXISTS books (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            author_id INTEGER NOT NULL,
-            qty INTEGER NOT NULL DEFAULT 1,
-            FOREIGN KEY(author_id) REFERENCES authors(id) ON DELETE CASCADE
-        );
+        cur.executescript(_DDL_AUTHORS.format(table="authors") + _DDL_BOOKS.format(table="books") + """
         CREATE TABLE IF NOT EXISTS loans (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             book_id INTEGER NOT NULL,
@@ -52,131 +193,245 @@ class Database:
             return_date DATE,
             FOREIGN KEY(book_id) REFERENCES books(id) ON DELETE CASCADE
         );
+        CREATE INDEX IF NOT EXISTS ix_books_title ON books(title);
+        CREATE INDEX IF NOT EXISTS ix_books_author ON books(author);
+        CREATE INDEX IF NOT EXISTS ix_loans_loan_date ON loans(loan_date, book_id);
+        CREATE INDEX IF NOT EXISTS ix_loans_book_id ON loans(book_id);
+        CREATE TRIGGER IF NOT EXISTS trg_books_author_insert AFTER INSERT ON books BEGIN
+            INSERT OR IGNORE INTO authors (id, name)
+            VALUES ((SELECT COALESCE(MAX(id), 0) + 1 FROM authors), NEW.author);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_books_author_update AFTER UPDATE OF author ON books BEGIN
+            INSERT OR IGNORE INTO authors (id, name)
+            VALUES ((SELECT COALESCE(MAX(id), 0) + 1 FROM authors), NEW.author);
+        END;
         """)
         self.conn.commit()
+        self._create_fts()
+
+    def _migrate_author_id_schema(self) -> None:
+        """Upgrade a database created with books.author_id and a rowid authors table in place.
+
+        Both tables are rebuilt rather than altered: books.author_id is NOT NULL and carries a
+        foreign key, so it can be neither left behind nor dropped with ALTER TABLE. Ids are kept,
+        so loans stay attached to their books.
+        """
+        book_columns = {r[1] for r in self.conn.execute("PRAGMA table_info(books)")}
+        authors = self.conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'authors'").fetchone()
+        steps = []
+        if "author_id" in book_columns:
+            steps.append(_DDL_BOOKS.format(table="books_new") + """
+            INSERT INTO books_new (id, title, author, qty)
+                SELECT b.id, b.title, COALESCE(a.name, 'Unknown'), b.qty
+                FROM books b LEFT JOIN authors a ON a.id = b.author_id;
+            -- carry the AUTOINCREMENT counter over so ids of deleted books are never reused
+            DELETE FROM sqlite_sequence WHERE name = 'books_new';
+            INSERT INTO sqlite_sequence (name, seq) SELECT 'books_new', seq FROM sqlite_sequence WHERE name = 'books';
+            DROP TABLE books;
+            ALTER TABLE books_new RENAME TO books;
+            """)
+        if authors and "WITHOUT ROWID" not in authors[0].upper():
+            steps.append(_DDL_AUTHORS.format(table="authors_new") + """
+            INSERT INTO authors_new (id, name) SELECT id, name FROM authors;
+            DROP TABLE authors;
+            ALTER TABLE authors_new RENAME TO authors;
+            """)
+        if not steps:
+            return
+        # foreign keys must be off while books is swapped, or dropping it would cascade to loans
+        try:
+            self.conn.executescript("PRAGMA foreign_keys = OFF; BEGIN;" + "".join(steps) + "COMMIT;")
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.execute("PRAGMA foreign_keys = ON")
+
+    def _create_fts(self) -> None:
+        """Create the books_fts trigram index and its sync triggers; skipped if FTS5 is unavailable."""
+        if self.conn.execute(_SQL_HAS_FTS).fetchone():
+            self.has_fts = True
+            return
+        try:
+            self.conn.executescript("""
+            BEGIN;
+            CREATE VIRTUAL TABLE books_fts USING fts5(
+                title, author, content='books', content_rowid='id', tokenize='trigram'
+            );
+            CREATE TRIGGER trg_books_fts_insert AFTER INSERT ON books BEGIN
+                INSERT INTO books_fts (rowid, title, author) VALUES (NEW.id, NEW.title, NEW.author);
+            END;
+            CREATE TRIGGER trg_books_fts_delete AFTER DELETE ON books BEGIN
+                INSERT INTO books_fts (books_fts, rowid, title, author) VALUES ('delete', OLD.id, OLD.title, OLD.author);
+            END;
+            CREATE TRIGGER trg_books_fts_update AFTER UPDATE OF title, author ON books BEGIN
+                INSERT INTO books_fts (books_fts, rowid, title, author) VALUES ('delete', OLD.id, OLD.title, OLD.author);
+                INSERT INTO books_fts (rowid, title, author) VALUES (NEW.id, NEW.title, NEW.author);
+            END;
+            INSERT INTO books_fts (books_fts) VALUES ('rebuild');
+            COMMIT;
+            """)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # no FTS5 (or no trigram tokenizer) in this SQLite build: get_books keeps using LIKE
+            self.conn.rollback()
+            self.has_fts = False
 
     # --- Basic CRUD ---
     def add_author(self, name: str) -> int:
-        cur = self.conn.cursor()
-        cur.execute("INSERT OR IGNORE INTO authors (name) VALUES (?)", (name,))
-        self.conn.commit()
-        cur.execute("SELECT id FROM authors WHERE name = ?", (name,))
-        return cur.fetchone()[0]
+        """Return the id for `name`, inserting it if needed."""
+        with self._write():
+            return self.conn.execute(_SQL_UPSERT_AUTHOR, (name,)).fetchone()[0]
 
     def add_book(self, title: str, author_name: str, qty: int = 1) -> int:
-        author_id = self.add_author(author_name)
-        cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO books (title, author_id, qty) VALUES (?,?,?)",
-            (title, author_id, qty),
-        )
-        self.conn.commit()
-        return cur.lastrowid
+        # the authors row is maintained by trg_books_author_insert
+        with self._write():
+            return self.conn.execute(_SQL_ADD_BOOK, (title, author_name, qty)).lastrowid
 
     def update_book_qty(self, book_id: int, delta: int) -> None:
-        cur = self.conn.cursor()
-        cur.execute("UPDATE books SET qty = qty + ? WHERE id = ?", (delta, book_id))
-        self.conn.commit()
+        with self._write():
+            self.conn.execute(_SQL_BOOK_QTY_DELTA, (delta, book_id))
 
     def update_book(self, book_id: int, title: Optional[str] = None, author_name: Optional[str] = None, qty: Optional[int] = None) -> None:
         """Partially update a book's title, author and/or qty. If author_name is provided it will be created if missing."""
-        cur = self.conn.cursor()
         updates = []
         params: list[object] = []
         if title is not None:
             updates.append("title = ?")
             params.append(title)
         if author_name is not None:
-            author_id = self.add_author(author_name)
-            updates.append("author_id = ?")
-            params.append(author_id)
+            updates.append("author = ?")
+            params.append(author_name)
         if qty is not None:
             updates.append("qty = ?")
             params.append(qty)
         if not updates:
             return
         params.append(book_id)
-        cur.execute(f"UPDATE books SET {', '.join(updates)} WHERE id = ?", tuple(params))
-        self.conn.commit()
+        with self._write():
+            self.conn.execute(f"UPDATE books SET {', '.join(updates)} WHERE id = ?", tuple(params))
 
     def delete_book(self, book_id: int) -> None:
-        cur = self.conn.cursor()
-        cur.execute("DELETE FROM books WHERE id = ?", (book_id,))
-        self.conn.commit()
+        with self._write():
+            self.conn.execute(_SQL_DELETE_BOOK, (book_id,))
+
+    def _query_books(self, cur: sqlite3.Cursor, title_like: Optional[str]) -> sqlite3.Cursor:
+        if not title_like:
+            return cur.execute(_SQL_GET_BOOKS)
+        if self.has_fts is None:
+            self.has_fts = self.conn.execute(_SQL_HAS_FTS).fetchone() is not None
+        # trigrams need at least three characters; shorter filters go through LIKE
+        if self.has_fts and len(title_like) >= 3:
+            phrase = '"' + title_like.replace('"', '""') + '"'
+            return cur.execute(_SQL_GET_BOOKS_MATCH, (f"title : {phrase}",))
+        return cur.execute(_SQL_GET_BOOKS_LIKE, (_like_substring(title_like),))
 
     def get_books(self, title_like: Optional[str] = None) -> List[Book]:
+        rows = self._query_books(self.conn.cursor(), title_like)
+        return [Book(r[0], r[1], r[2], r[3]) for r in rows.fetchall()]
+
+    def iter_book_rows(self, title_like: Optional[str] = None, batch_size: int = 500) -> Iterator[sqlite3.Row]:
+        """Yield (id, title, author, qty) rows lazily, fetching `batch_size` at a time."""
         cur = self.conn.cursor()
-        if title_like:
-            rows = cur.execute(
-                "SELECT b.id, b.title, a.name AS author, b.qty FROM books b JOIN authors a ON a.id = b.author_id WHERE b.title LIKE ?",
-                (f"%{title_like}%",),
+        cur.arraysize = batch_size
+        self._query_books(cur, title_like)
+        while True:
+            rows = cur.fetchmany()
+            if not rows:
+                return
+            yield from rows
+
+    # --- Bulk loading ---
+    @staticmethod
+    def _insert_books(cur: sqlite3.Cursor, rows: Sequence[Tuple[str, str, int]]) -> List[int]:
+        """Insert (title, author, qty) rows with multi-row VALUES statements; returns ids in order."""
+        ids: List[int] = []
+        for i in range(0, len(rows), BULK_CHUNK):
+            chunk = rows[i:i + BULK_CHUNK]
+            cur.execute(
+                "INSERT INTO books (title, author, qty) VALUES " + ",".join(["(?,?,?)"] * len(chunk)),
+                [p for row in chunk for p in row],
             )
-        else:
-            rows = cur.execute(
-                "SELECT b.id, b.title, a.name AS author, b.qty FROM books b JOIN authors a ON a.id = b.author_id"
+            # one statement under the write lock assigns consecutive AUTOINCREMENT ids
+            ids.extend(range(cur.lastrowid - len(chunk) + 1, cur.lastrowid + 1))
+        return ids
+
+    def add_books_bulk(self, rows: Sequence[Tuple[str, str, int]]) -> List[int]:
+        """Add many (title, author_name, qty) books in one transaction; returns the new ids."""
+        if not rows:
+            return []
+        with self._write():
+            return self._insert_books(self.conn.cursor(), rows)
+
+    def bulk_seed(
+        self,
+        books: Sequence[Tuple[str, str, int]],
+        loans: Sequence[Tuple[int, str, date]],
+    ) -> List[int]:
+        """Load books and loans in a single transaction (authors follow from the books).
+
+        books are (title, author_name, qty); loans are (book_index, borrower, loan_date)
+        where book_index points into `books`. Returns the new book ids in input order.
+        """
+        taken = Counter(idx for idx, _borrower, _loan_date in loans)
+        for idx, n in taken.items():
+            if books[idx][2] < n:
+                raise ValueError(f"not enough copies of {books[idx][0]!r} for {n} loans")
+        with self._write():
+            cur = self.conn.cursor()
+            book_ids = self._insert_books(cur, books)
+            cur.executemany(
+                _SQL_LOAN_INSERT,
+                [(book_ids[idx], borrower, loan_date) for idx, borrower, loan_date in loans],
             )
-        return [Book(**r) for r in (dict(row) for row in rows.fetchall())]
+            cur.executemany(
+                _SQL_BOOK_QTY_DELTA,
+                [(-n, book_ids[idx]) for idx, n in taken.items()],
+            )
+        return book_ids
 
     # --- Loans ---
     def loan_book(self, book_id: int, borrower: str, loan_date: Optional[date] = None) -> int:
         loan_date = loan_date or date.today()
-        cur = self.conn.cursor()
-        # decrement qty
-        cur.execute("SELECT qty FROM books WHERE id = ?", (book_id,))
-        row = cur.fetchone()
-        if not row:
-            raise ValueError("book not found")
-        if row[0] <= 0:
-            raise ValueError("no copies available")
-        cur.execute("INSERT INTO loans (book_id, borrower, loan_date) VALUES (?,?,?)", (book_id, borrower, loan_date.isoformat()))
-        cur.execute("UPDATE books SET qty = qty - 1 WHERE id = ?", (book_id,))
-        self.conn.commit()
-        return cur.lastrowid
+        with self._write():
+            # decrement qty only if a copy is available; no separate read, so no check-then-act race
+            row = self.conn.execute(_SQL_LOAN_TAKE_COPY, (book_id,)).fetchone()
+            if row is None:
+                exists = self.conn.execute(_SQL_BOOK_EXISTS, (book_id,)).fetchone()
+                raise ValueError("no copies available" if exists else "book not found")
+            return self.conn.execute(_SQL_LOAN_INSERT, (book_id, borrower, loan_date)).lastrowid
 
     def return_loan(self, loan_id: int, return_date: Optional[date] = None) -> None:
-        return_date = (return_date or date.today()).isoformat()
-        cur = self.conn.cursor()
-        cur.execute("SELECT book_id FROM loans WHERE id = ?", (loan_id,))
-        row = cur.fetchone()
-        if not row:
-            raise ValueError("loan not found")
-        cur.execute("UPDATE loans SET return_date = ? WHERE id = ?", (return_date, loan_id))
-        cur.execute("UPDATE books SET qty = qty + 1 WHERE id = ?", (row[0],))
-        self.conn.commit()
+        return_date = return_date or date.today()
+        with self._write():
+            # only an open loan can be returned, so a repeat return never adds another copy
+            row = self.conn.execute(_SQL_LOAN_RETURN, (return_date, loan_id)).fetchone()
+            if row is None:
+                exists = self.conn.execute(_SQL_LOAN_EXISTS, (loan_id,)).fetchone()
+                raise ValueError("loan already returned" if exists else "loan not found")
+            self.conn.execute(_SQL_BOOK_QTY_DELTA, (1, row[0]))
 
     def delete_loan(self, loan_id: int) -> None:
-        cur = self.conn.cursor()
-        cur.execute("DELETE FROM loans WHERE id = ?", (loan_id,))
-        self.conn.commit()
+        with self._write():
+            self.conn.execute(_SQL_DELETE_LOAN, (loan_id,))
 
     # --- Reporting: join + aggregates + date filtering ---
-    def book_loan_counts(self) -> List[Tuple[int, str, str, int]]:
-        """Return (book_id, title, author, times_loaned)"""
-        cur = self.conn.cursor()
-        rows = cur.execute(
-            """
-            SELECT b.id AS book_id, b.title, a.name AS author, COUNT(l.id) AS times_loaned
-            FROM books b
-            JOIN authors a ON a.id = b.author_id
-            LEFT JOIN loans l ON l.book_id = b.id
-            GROUP BY b.id
-            ORDER BY times_loaned DESC
-            """
-        )
-        return [(r["book_id"], r["title"], r["author"], r["times_loaned"]) for r in rows.fetchall()]
+    def book_loan_counts(self, limit: int = 20) -> List[Tuple[int, str, str, int]]:
+        """Return up to `limit` (book_id, title, author, times_loaned), most loaned first; -1 for all."""
+        rows = self.conn.execute(_SQL_BOOK_LOAN_COUNTS, (limit,))
+        return [(r[0], r[1], r[2], r[3]) for r in rows.fetchall()]
 
     def loan_aggregates(self) -> Tuple[int, float]:
         """Return (total_loans, avg_loans_per_book)"""
-        cur = self.conn.cursor()
-        total = cur.execute("SELECT COUNT(*) FROM loans").fetchone()[0]
-        avg = cur.execute("SELECT AVG(cnt) FROM (SELECT COUNT(*) AS cnt FROM loans GROUP BY book_id)").fetchone()[0] or 0.0
-        return total, float(avg)
+        total, avg = self.conn.execute(_SQL_LOAN_AGGREGATES).fetchone()
+        return total, float(avg or 0.0)
 
-    def loans_in_date_range(self, from_date: str, to_date: str) -> List[sqlite3.Row]:
-        cur = self.conn.cursor()
-        rows = cur.execute(
-            "SELECT l.id, b.title, l.borrower, l.loan_date, l.return_date FROM loans l JOIN books b ON b.id = l.book_id WHERE l.loan_date BETWEEN ? AND ? ORDER BY l.loan_date",
-            (from_date, to_date),
+    def loans_in_date_range(self, from_date: str | date, to_date: str | date) -> List[sqlite3.Row]:
+        """Return loans whose loan_date falls within [from_date, to_date] (both inclusive)."""
+        start, end = _as_date(from_date), _as_date(to_date)
+        rows = self.conn.execute(
+            _SQL_LOANS_IN_RANGE,
+            (start, end + timedelta(days=1)),
         )
         return rows.fetchall()
 
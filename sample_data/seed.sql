@@ -2,16 +2,16 @@
 PRAGMA foreign_keys = ON;
 
 CREATE TABLE authors (
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  name TEXT NOT NULL UNIQUE
-);
+  id INTEGER NOT NULL,
+  name TEXT NOT NULL PRIMARY KEY,
+  UNIQUE(id)
+) WITHOUT ROWID, STRICT;
 
 CREATE TABLE books (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   title TEXT NOT NULL,
-  author_id INTEGER NOT NULL,
-  qty INTEGER NOT NULL DEFAULT 1,
-  FOREIGN KEY(author_id) REFERENCES authors(id) ON DELETE CASCADE
+  author TEXT NOT NULL,
+  qty INTEGER NOT NULL DEFAULT 1
 );
 
 CREATE TABLE loans (
@@ -23,26 +23,59 @@ CREATE TABLE loans (
   FOREIGN KEY(book_id) REFERENCES books(id) ON DELETE CASCADE
 );
 
+CREATE INDEX ix_books_title ON books(title);
+CREATE INDEX ix_books_author ON books(author);
+CREATE INDEX ix_loans_loan_date ON loans(loan_date, book_id);
+CREATE INDEX ix_loans_book_id ON loans(book_id);
+
+CREATE TRIGGER trg_books_author_insert AFTER INSERT ON books BEGIN
+  INSERT OR IGNORE INTO authors (id, name)
+  VALUES ((SELECT COALESCE(MAX(id), 0) + 1 FROM authors), NEW.author);
+END;
+
+CREATE TRIGGER trg_books_author_update AFTER UPDATE OF author ON books BEGIN
+  INSERT OR IGNORE INTO authors (id, name)
+  VALUES ((SELECT COALESCE(MAX(id), 0) + 1 FROM authors), NEW.author);
+END;
+
+-- Trigram full-text index for title substring search (external content over books)
+CREATE VIRTUAL TABLE books_fts USING fts5(
+  title, author, content='books', content_rowid='id', tokenize='trigram'
+);
+
+CREATE TRIGGER trg_books_fts_insert AFTER INSERT ON books BEGIN
+  INSERT INTO books_fts (rowid, title, author) VALUES (NEW.id, NEW.title, NEW.author);
+END;
+
+CREATE TRIGGER trg_books_fts_delete AFTER DELETE ON books BEGIN
+  INSERT INTO books_fts (books_fts, rowid, title, author) VALUES ('delete', OLD.id, OLD.title, OLD.author);
+END;
+
+CREATE TRIGGER trg_books_fts_update AFTER UPDATE OF title, author ON books BEGIN
+  INSERT INTO books_fts (books_fts, rowid, title, author) VALUES ('delete', OLD.id, OLD.title, OLD.author);
+  INSERT INTO books_fts (rowid, title, author) VALUES (NEW.id, NEW.title, NEW.author);
+END;
+
 -- Sample data
-INSERT INTO authors (name) VALUES
-  ('J. K. Rowling'),
-  ('Frank Herbert'),
-  ('Alan Beaulieu'),
-  ('Andrew Hunt'),
-  ('Robert C. Martin'),
-  ('Cal Newport'),
-  ('Cormen et al.'),
-  ('J. R. R. Tolkien');
-
-INSERT INTO books (title, author_id, qty) VALUES
-  ('Harry Potter and the Philosopher''s Stone', 1, 3),
-  ('Dune', 2, 2),
-  ('Learning SQL', 3, 2),
-  ('The Pragmatic Programmer', 4, 2),
-  ('Clean Code', 5, 2),
-  ('Deep Work', 6, 2),
-  ('Introduction to Algorithms', 7, 2),
-  ('The Hobbit', 8, 2);
+INSERT INTO authors (id, name) VALUES
+  (1, 'J. K. Rowling'),
+  (2, 'Frank Herbert'),
+  (3, 'Alan Beaulieu'),
+  (4, 'Andrew Hunt'),
+  (5, 'Robert C. Martin'),
+  (6, 'Cal Newport'),
+  (7, 'Cormen et al.'),
+  (8, 'J. R. R. Tolkien');
+
+INSERT INTO books (title, author, qty) VALUES
+  ('Harry Potter and the Philosopher''s Stone', 'J. K. Rowling', 3),
+  ('Dune', 'Frank Herbert', 2),
+  ('Learning SQL', 'Alan Beaulieu', 2),
+  ('The Pragmatic Programmer', 'Andrew Hunt', 2),
+  ('Clean Code', 'Robert C. Martin', 2),
+  ('Deep Work', 'Cal Newport', 2),
+  ('Introduction to Algorithms', 'Cormen et al.', 2),
+  ('The Hobbit', 'J. R. R. Tolkien', 2);
 
 INSERT INTO loans (book_id, borrower, loan_date) VALUES
   (2, 'Sam', '2024-11-05'),
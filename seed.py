@@ -6,32 +6,37 @@ from db import Database
 
 SAMPLE_DB = Path("./data/library.db")
 
+# Authors + books (diverse titles; qty >= 2)
+BOOKS = [
+    ("Harry Potter and the Philosopher's Stone", "J. K. Rowling", 3),
+    ("Dune", "Frank Herbert", 2),
+    ("Learning SQL", "Alan Beaulieu", 2),
+    ("The Pragmatic Programmer", "Andrew Hunt", 2),
+    ("Clean Code", "Robert C. Martin", 2),
+    ("Deep Work", "Cal Newport", 2),
+    ("Introduction to Algorithms", "Cormen et al.", 2),
+    ("The Hobbit", "J. R. R. Tolkien", 2),
+]
+
+# Loans with varying dates to demonstrate date-range filtering (book index into BOOKS)
+LOANS = [
+    (1, "Sam", date(2024, 11, 5)),
+    (0, "Riley", date(2025, 2, 10)),
+    (0, "Taylor", date(2025, 6, 1)),
+    (2, "Jordan", date(2025, 7, 20)),
+    (3, "Alex", date(2025, 3, 15)),
+    (4, "Morgan", date(2025, 8, 1)),
+]
+
 
 def seed(path: Path | str = SAMPLE_DB) -> None:
+    Database.ensure_path(path)
     db = Database(path)
     db.create_tables()
-
-    # Authors + books (diverse titles; qty >= 2)
-    hp = db.add_book("Harry Potter and the Philosopher's Stone", "J. K. Rowling", qty=3)
-    dune = db.add_book("Dune", "Frank Herbert", qty=2)
-    sql_book = db.add_book("Learning SQL", "Alan Beaulieu", qty=2)
-    pragmatic = db.add_book("The Pragmatic Programmer", "Andrew Hunt", qty=2)
-    clean = db.add_book("Clean Code", "Robert C. Martin", qty=2)
-    deep = db.add_book("Deep Work", "Cal Newport", qty=2)
-    algo = db.add_book("Introduction to Algorithms", "Cormen et al.", qty=2)
-    hobbit = db.add_book("The Hobbit", "J. R. R. Tolkien", qty=2)
-
-    # Loans with varying dates to demonstrate date-range filtering
-    db.loan_book(dune, "Sam", loan_date=date(2024, 11, 5))
-    db.loan_book(hp, "Riley", loan_date=date(2025, 2, 10))
-    db.loan_book(hp, "Taylor", loan_date=date(2025, 6, 1))
-    db.loan_book(sql_book, "Jordan", loan_date=date(2025, 7, 20))
-    db.loan_book(pragmatic, "Alex", loan_date=date(2025, 3, 15))
-    db.loan_book(clean, "Morgan", loan_date=date(2025, 8, 1))
-
+    db.bulk_seed(BOOKS, LOANS)
     print(f"seeded sample data into {db.path}")
     db.close()
 
 
 if __name__ == "__main__":
-    seed()
\ No newline at end of file
+    seed()
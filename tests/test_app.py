@@ -0,0 +1,70 @@
+import csv
+import json
+
+import pytest
+
+import app
+from db import Database
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "cli.db"
+    app.main(["--db", str(path), "init-db"])
+    return path
+
+
+def _books(db_path):
+    db = Database(db_path)
+    try:
+        return [(b.title, b.author, b.qty) for b in db.get_books()]
+    finally:
+        db.close()
+
+
+def test_batch_json(db_path, tmp_path, capsys):
+    ops = tmp_path / "ops.json"
+    ops.write_text(json.dumps([
+        {"op": "add-book", "title": "A", "author": "X", "qty": 2},
+        {"op": "add-book", "title": "B", "author": "Y"},
+        {"op": "loan-book", "book_id": 1, "borrower": "pat", "date": "2025-01-02"},
+        {"op": "return-loan", "loan_id": 1, "date": "2025-01-05"},
+        {"op": "loan-book", "book_id": 2, "borrower": "sam"},
+    ]))
+    app.main(["--db", str(db_path), "batch", str(ops)])
+    assert "2 books added, 2 loans, 1 returns" in capsys.readouterr().out
+    assert _books(db_path) == [("A", "X", 2), ("B", "Y", 0)]
+
+
+def test_batch_csv_rolls_back_on_failing_op(db_path, tmp_path):
+    ops = tmp_path / "ops.csv"
+    with open(ops, "w", newline="") as fh:
+        w = csv.writer(fh)
+        w.writerow(["op", "title", "author", "qty", "book_id", "borrower", "loan_id", "date"])
+        w.writerow(["add-book", "C", "Z", "1", "", "", "", ""])
+        w.writerow(["loan-book", "", "", "", "1", "first", "", "2025-03-01"])
+        w.writerow(["loan-book", "", "", "", "1", "second", "", "2025-03-02"])  # no copies left
+    with pytest.raises(SystemExit, match=r"operation 3: no copies available"):
+        app.main(["--db", str(db_path), "batch", str(ops)])
+    assert _books(db_path) == []
+
+
+@pytest.mark.parametrize("payload, message", [
+    ({"op": "add-book"}, "expected a list of operations"),
+    ([{"op": "add-book", "author": "X"}], "operation 1: missing 'title'"),
+    ([{"op": "add-book", "title": "T", "author": "X"}, "loan"], "operation 2: expected an object"),
+    ([{"op": "shelve"}], "operation 1: unknown op 'shelve'"),
+    ([{"op": "add-book", "title": "T", "author": "X", "qty": "many"}], "operation 1: 'qty' must be an integer"),
+    ([{"op": "add-book", "title": "T", "author": "X", "qty": None}], "operation 1: 'qty' must be an integer"),
+    ([{"op": "add-book", "title": "T", "author": "X", "qty": -5}], r"operation 1: 'qty' must be >= 1"),
+    ([{"op": "add-book", "title": None, "author": "X"}], "operation 1: 'title' must be a non-empty string"),
+    ([{"op": "loan-book", "book_id": None, "borrower": "pat"}], "operation 1: 'book_id' must be an integer"),
+    ([{"op": "loan-book", "book_id": 1, "borrower": "pat", "date": 20250101}], "operation 1: 'date' must be an ISO date string"),
+    ([{"op": "return-loan", "loan_id": 1, "date": "yesterday"}], "operation 1: 'date' must be an ISO date string"),
+])
+def test_batch_rejects_bad_input(db_path, tmp_path, payload, message):
+    ops = tmp_path / "bad.json"
+    ops.write_text(json.dumps(payload))
+    with pytest.raises(SystemExit, match=message):
+        app.main(["--db", str(db_path), "batch", str(ops)])
+    assert _books(db_path) == []
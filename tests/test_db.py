@@ -1,8 +1,11 @@
 import tempfile
-from datetime import date
+import sqlite3
+import threading
+from datetime import date, datetime
 
 import pytest
 
+import db as db_module
 from db import Database
 
 
@@ -42,7 +45,7 @@ def test_join_and_aggregates(db_path):
     assert counts[b1] == 2
     total, avg = db.loan_aggregates()
     assert total == 3
-    assert avg >= 1.0
+    assert avg == 1.5
     db.close()
 
 
@@ -61,4 +64,290 @@ def test_date_range_filter(db_path):
     assert [x for x in db.get_books() if x.id == b][0].title == "DR-updated"
     db.delete_book(b)
     assert all(x.id != b for x in db.get_books())
-    db.close()
\ No newline at end of file
+    db.close()
+
+
+def test_bulk_seed(db_path):
+    db = Database(db_path)
+    db.create_tables()
+    ids = db.bulk_seed(
+        [("One", "X", 2), ("Two", "Y", 1)],
+        [(0, "u1", date(2025, 3, 1)), (0, "u2", date(2025, 3, 2))],
+    )
+    books = {b.id: b for b in db.get_books()}
+    assert [books[i].title for i in ids] == ["One", "Two"]
+    assert books[ids[0]].qty == 0 and books[ids[1]].qty == 1
+    assert db.loan_aggregates()[0] == 2
+    assert db.conn.execute("SELECT COUNT(*) FROM authors").fetchone()[0] == 2
+
+    with pytest.raises(ValueError):
+        db.bulk_seed([("Three", "Z", 1)], [(0, "a", date(2025, 1, 1)), (0, "b", date(2025, 1, 1))])
+    assert len(db.get_books()) == 2
+    db.close()
+
+
+def test_report_queries_use_indexes(db_path):
+    db = Database(db_path)
+    db.create_tables()
+    plan = " ".join(r[3] for r in db.conn.execute(
+        "EXPLAIN QUERY PLAN " + db_module._SQL_LOANS_IN_RANGE, ("2025-01-01", "2026-01-01")))
+    assert "SEARCH l USING INDEX ix_loans_loan_date" in plan
+    plan = " ".join(r[3] for r in db.conn.execute(
+        "EXPLAIN QUERY PLAN SELECT COUNT(*) FROM loans WHERE book_id = ?", (1,)))
+    assert "ix_loans_book_id" in plan
+    db.close()
+
+
+def test_date_range_is_inclusive_and_validated(db_path):
+    db = Database(db_path)
+    db.create_tables()
+    b = db.add_book("Edge", "E", qty=3)
+    db.loan_book(b, "first", loan_date=date(2025, 1, 1))
+    db.loan_book(b, "last", loan_date=date(2025, 12, 31))
+    db.loan_book(b, "after", loan_date=date(2026, 1, 1))
+
+    rows = db.loans_in_date_range("2025-01-01", "2025-12-31")
+    assert [r["borrower"] for r in rows] == ["first", "last"]
+    assert len(db.loans_in_date_range(date(2025, 12, 31), date(2026, 1, 1))) == 2
+    assert len(db.loans_in_date_range(datetime(2025, 12, 31, 18), datetime(2026, 1, 1, 9))) == 2
+    stored = [r[0] for r in db.conn.execute("SELECT loan_date FROM loans ORDER BY id")]
+    assert stored == ["2025-01-01", "2025-12-31", "2026-01-01"]  # dates bind as ISO text
+    with pytest.raises(ValueError):
+        db.loans_in_date_range("not-a-date", "2025-12-31")
+    db.close()
+
+
+def test_loan_errors_leave_state_unchanged(db_path):
+    db = Database(db_path)
+    db.create_tables()
+    b = db.add_book("Only", "O", qty=1)
+    db.loan_book(b, "first", loan_date=date(2025, 1, 1))
+    with pytest.raises(ValueError, match="no copies"):
+        db.loan_book(b, "second", loan_date=date(2025, 1, 2))
+    with pytest.raises(ValueError, match="book not found"):
+        db.loan_book(b + 100, "ghost")
+    with pytest.raises(ValueError, match="loan not found"):
+        db.return_loan(999)
+    assert db.loan_aggregates()[0] == 1
+    assert db.get_books()[0].qty == 0
+    db.close()
+
+
+def test_double_return_does_not_add_copies(db_path):
+    db = Database(db_path)
+    db.create_tables()
+    b = db.add_book("Once", "O", qty=1)
+    loan_id = db.loan_book(b, "p", loan_date=date(2025, 1, 1))
+    db.return_loan(loan_id, return_date=date(2025, 1, 5))
+    for _ in range(2):
+        with pytest.raises(ValueError, match="loan already returned"):
+            db.return_loan(loan_id, return_date=date(2025, 1, 6))
+    assert db.get_books()[0].qty == 1
+    assert db.loans_in_date_range("2025-01-01", "2025-01-01")[0]["return_date"] == "2025-01-05"
+    db.close()
+
+
+def test_concurrent_loans_never_oversell(db_path):
+    db = Database(db_path)
+    db.create_tables()
+    b = db.add_book("Popular", "P", qty=3)
+    db.close()
+
+    results = []
+    barrier = threading.Barrier(8)
+
+    def borrow(n):
+        conn_db = Database(db_path)
+        barrier.wait()
+        try:
+            conn_db.loan_book(b, f"u{n}", loan_date=date(2025, 1, 1))
+            results.append("ok")
+        except ValueError:
+            results.append("none")
+        finally:
+            conn_db.close()
+
+    threads = [threading.Thread(target=borrow, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results.count("ok") == 3 and results.count("none") == 5
+    db = Database(db_path)
+    assert db.get_books()[0].qty == 0
+    assert db.loan_aggregates()[0] == 3
+    db.close()
+
+
+def test_connection_pragmas(db_path, tmp_path):
+    db = Database(db_path)
+    db.create_tables()
+    assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert db.conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    b = db.add_book("FK", "F", qty=1)
+    db.loan_book(b, "p", loan_date=date(2025, 1, 1))
+    db.delete_book(b)
+    assert db.loan_aggregates()[0] == 0  # ON DELETE CASCADE is enforced
+    db.close()
+
+    class RollbackJournalDatabase(Database):
+        USE_WAL = False
+
+    plain = RollbackJournalDatabase(tmp_path / "plain.db")
+    assert plain.conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    plain.close()
+
+
+def test_ensure_path_creates_parent_once(tmp_path):
+    nested = tmp_path / "a" / "b" / "lib.db"
+    Database.ensure_path(nested)
+    assert nested.parent.is_dir()
+    db = Database(nested)
+    db.create_tables()
+    db.close()
+    assert nested.exists()
+
+
+def test_authors_maintained_from_books(db_path):
+    db = Database(db_path)
+    db.create_tables()
+    first = db.add_book("One", "Same Author")
+    db.add_book("Two", "Same Author")
+    assert [tuple(r) for r in db.conn.execute("SELECT id, name FROM authors")] == [(1, "Same Author")]
+    assert db.add_author("Same Author") == 1
+    db.update_book(first, author_name="Other")
+    assert [b.author for b in db.get_books()] == ["Other", "Same Author"]
+    assert [db.add_author(n) for n in ("Other", "C", "Other")] == [2, 3, 2]
+    db.close()
+
+    # a standalone add_author commits and leaves no write transaction open
+    db = Database(db_path)
+    assert db.add_author("Zed") == 4
+    assert not db.conn.in_transaction
+    db.close()
+    db = Database(db_path)
+    assert db.conn.execute("SELECT id FROM authors WHERE name = 'Zed'").fetchone()[0] == 4
+    db.close()
+
+
+def test_book_loan_counts_limit_and_plan(db_path):
+    db = Database(db_path)
+    db.create_tables()
+    ids = db.add_books_bulk([(f"T{i}", "A", 5) for i in range(5)])
+    for n, bid in enumerate(ids):
+        for k in range(n):
+            db.loan_book(bid, f"u{k}", loan_date=date(2025, 1, 1))
+    top = db.book_loan_counts(limit=2)
+    assert [(bid, times) for bid, _t, _a, times in top] == [(ids[4], 4), (ids[3], 3)]
+    assert len(db.book_loan_counts(limit=-1)) == 5
+    plan = " ".join(r[3] for r in db.conn.execute("EXPLAIN QUERY PLAN " + db_module._SQL_BOOK_LOAN_COUNTS, (2,)))
+    assert "SEARCH loans USING COVERING INDEX ix_loans_book_id" in plan
+    db.close()
+
+
+def test_title_filter_uses_fts_index(db_path):
+    db = Database(db_path)
+    db.create_tables()
+    hobbit = db.add_book("The Hobbit", "Tolkien")
+    db.add_book("Dune", "Herbert")
+    db.add_book('The "Quoted" Book', "Q")
+
+    assert [b.title for b in db.get_books(title_like="hobb")] == ["The Hobbit"]
+    assert [b.title for b in db.get_books(title_like='"Quoted"')] == ['The "Quoted" Book']
+    assert [b.title for b in db.get_books(title_like="Du")] == ["Dune"]  # too short for trigrams: LIKE
+    assert db.get_books(title_like="Tolkien") == []  # title only, not author
+
+    db.update_book(hobbit, title="There and Back Again")
+    assert db.get_books(title_like="Hobbit") == []
+    assert [b.id for b in db.get_books(title_like="back again")] == [hobbit]
+    db.delete_book(hobbit)
+    assert db.get_books(title_like="back again") == []
+
+    plan = " ".join(r[3] for r in db.conn.execute("EXPLAIN QUERY PLAN SELECT rowid FROM books_fts WHERE books_fts MATCH 'hobbit'"))
+    assert "VIRTUAL TABLE INDEX" in plan
+    db.close()
+
+
+def test_title_filter_wildcards_are_literal(db_path):
+    db = Database(db_path)
+    db.create_tables()
+    db.add_book("100% Pure", "A")
+    db.add_book("1000 Pure", "B")
+    db.add_book("snake_case", "C")
+    db.add_book("snakeXcase", "D")
+    db.add_book("back\\slash", "E")
+
+    for fts in (True, False):
+        db.has_fts = fts
+        assert [b.title for b in db.get_books(title_like="0%")] == ["100% Pure"]
+        assert [b.title for b in db.get_books(title_like="00%")] == ["100% Pure"]
+        assert [b.title for b in db.get_books(title_like="e_c")] == ["snake_case"]
+        assert [b.title for b in db.get_books(title_like="_")] == ["snake_case"]
+        assert [b.title for b in db.get_books(title_like="k\\s")] == ["back\\slash"]
+    db.close()
+
+
+def test_context_manager_is_one_transaction(db_path):
+    db = Database(db_path)
+    db.create_tables()
+    db.close()
+
+    with Database(db_path) as db:
+        b = db.add_book("Ctx", "C", qty=1)
+        db.loan_book(b, "ok", loan_date=date(2025, 1, 1))
+    with pytest.raises(ValueError):
+        with Database(db_path) as db:
+            db.add_book("Rolled back", "R")
+            db.loan_book(b, "none left")
+
+    db = Database(db_path)
+    assert [(x.title, x.qty) for x in db.get_books()] == [("Ctx", 0)]
+    assert db.loan_aggregates()[0] == 1
+    db.close()
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE authors (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE);
+CREATE TABLE books (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, author_id INTEGER NOT NULL,
+    qty INTEGER NOT NULL DEFAULT 1, FOREIGN KEY(author_id) REFERENCES authors(id) ON DELETE CASCADE
+);
+CREATE TABLE loans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, book_id INTEGER NOT NULL, borrower TEXT NOT NULL,
+    loan_date DATE NOT NULL, return_date DATE, FOREIGN KEY(book_id) REFERENCES books(id) ON DELETE CASCADE
+);
+INSERT INTO authors (name) VALUES ('Frank Herbert'), ('J. R. R. Tolkien');
+INSERT INTO books (title, author_id, qty) VALUES ('Dune', 1, 1), ('The Hobbit', 2, 2), ('Gone', 2, 1);
+DELETE FROM books WHERE id = 3;
+INSERT INTO loans (book_id, borrower, loan_date) VALUES (1, 'Sam', '2024-11-05');
+"""
+
+
+def test_create_tables_migrates_author_id_schema(db_path):
+    legacy = sqlite3.connect(db_path)
+    legacy.executescript(LEGACY_SCHEMA)
+    legacy.close()
+
+    db = Database(db_path)
+    db.create_tables()
+    assert [(b.id, b.title, b.author, b.qty) for b in db.get_books()] == [
+        (1, "Dune", "Frank Herbert", 1), (2, "The Hobbit", "J. R. R. Tolkien", 2)]
+    assert [tuple(r) for r in db.conn.execute("SELECT id, name FROM authors ORDER BY id")] == [
+        (1, "Frank Herbert"), (2, "J. R. R. Tolkien")]
+    assert "WITHOUT ROWID" in db.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'authors'").fetchone()[0]
+    assert [r["borrower"] for r in db.loans_in_date_range("2024-01-01", "2024-12-31")] == ["Sam"]
+    assert db.conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    assert db.conn.execute("PRAGMA foreign_key_check").fetchall() == []
+
+    # AUTOINCREMENT continues past the deleted id, new authors and search work
+    assert db.add_book("Children of Dune", "Frank Herbert") == 4
+    assert db.add_book("New", "Someone") == 5
+    assert db.add_author("Someone") == 3
+    assert [b.title for b in db.get_books(title_like="hobbit")] == ["The Hobbit"]
+    db.close()
+
+    db = Database(db_path)
+    db.create_tables()  # second run is a no-op
+    assert len(db.get_books()) == 4
+    db.close()
@@ -52,6 +52,12 @@ def test_books_and_loan_flow(client, tmp_path):
     r = client.patch(f'/api/loans/{loan_id}', json={'borrower': 'QA2'})
     assert r.status_code == 200
 
+    # PATCH loan (set return date; bad dates are rejected)
+    r = client.patch(f'/api/loans/{loan_id}', json={'return_date': '2025-02-01'})
+    assert r.status_code == 200
+    r = client.patch(f'/api/loans/{loan_id}', json={'return_date': 'soon'})
+    assert r.status_code == 400
+
     # DELETE loan
     r = client.delete(f'/api/loans/{loan_id}')
     assert r.status_code == 200
@@ -65,4 +71,54 @@ def test_books_and_loan_flow(client, tmp_path):
     # basic index page loads
     r = client.get('/')
     assert r.status_code == 200
-    assert b'Library Catalog' in r.data
\ No newline at end of file
+    assert b'Library Catalog' in r.data
+
+
+def test_connection_reused_across_requests(tmp_path, monkeypatch):
+    import webapp
+
+    db_path = tmp_path / "pool.db"
+    app = create_app(db_path)
+    opened = []
+    real_connect = webapp.sqlite3.connect
+
+    def counting_connect(*args, **kwargs):
+        opened.append(args)
+        return real_connect(*args, **kwargs)
+
+    monkeypatch.setattr(webapp.sqlite3, "connect", counting_connect)
+    with app.test_client() as c:
+        for _ in range(3):
+            assert c.get('/api/books').status_code == 200
+    assert len(opened) == 1
+    with Database(db_path) as db:
+        assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+
+
+def test_bulk_create_books(client):
+    rows = [{'title': f'Bulk {i}', 'author': f'Author {i % 3}', 'qty': 1 + i % 2} for i in range(650)]
+    r = client.post('/api/books/bulk', json=rows)
+    assert r.status_code == 201
+    ids = r.json['book_ids']
+    assert len(ids) == 650
+
+    by_id = {b['id']: b for b in client.get('/api/books').json}
+    assert [by_id[i]['title'] for i in ids] == [row['title'] for row in rows]
+    assert by_id[ids[4]]['author'] == 'Author 1' and by_id[ids[5]]['qty'] == 2
+
+    r = client.post('/api/books/bulk', json=[{'title': 'ok', 'author': 'a'}, {'title': 'bad', 'author': 'a', 'qty': 0}])
+    assert r.status_code == 400
+
+
+def test_stats_cache_invalidated_by_writes(client, tmp_path):
+    bid = client.post('/api/books', json={'title': 'S', 'author': 'A', 'qty': 3}).json['book_id']
+    assert client.get('/api/stats').json['total_loans'] == 0
+    client.post('/api/loan', json={'book_id': bid, 'borrower': 'x'})
+    assert client.get('/api/stats').json['total_loans'] == 1
+
+    # a write from another connection (e.g. the CLI) must also invalidate the cache
+    other = Database(tmp_path / "w.db")
+    other.update_book(bid, title="S renamed")
+    other.close()
+    stats = client.get('/api/stats').json
+    assert stats['top_books'][0]['title'] == 'S renamed'
@@ -1,35 +1,79 @@
 """webapp.py — small Flask UI + JSON API for the Library Catalog.
 
 Provides:
-- GET  /api/books       -> list books (JSON)
+- GET  /api/books       -> list books (JSON, streamed)
+- POST /api/books/bulk  -> add many books (JSON body: list of {title, author, qty})
 - POST /api/loan        -> create a loan (JSON body: book_id, borrower)
 - POST /api/return      -> return a loan (JSON body: loan_id)
 - GET  /api/stats       -> aggregates
 - GET  /                -> simple HTML UI
 
 The app is created with `create_app(db_path)` so tests can provide a temporary DB.
+Each worker thread keeps one open SQLite connection that is reused across requests.
 """
 from __future__ import annotations
-from flask import Flask, jsonify, request, render_template
+import json
+import sqlite3
+import threading
+from datetime import date
+from flask import Flask, Response, jsonify, request, render_template, stream_with_context
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
-from db import Database
+from db import CACHED_STATEMENTS, Database
 
 
 def create_app(db_path: Optional[Path] = None) -> Flask:
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.config["DB_PATH"] = db_path or Path("./data/library.db")
-
-    def get_db():
-        return Database(app.config["DB_PATH"])
+    Database.ensure_path(app.config["DB_PATH"])
+    # creates missing tables and upgrades databases from the older author_id schema
+    with Database(app.config["DB_PATH"]) as db:
+        db.create_tables()
+    has_fts = db.has_fts
+
+    conns: Dict[int, sqlite3.Connection] = {}
+    conns_lock = threading.Lock()
+
+    def _get_conn() -> sqlite3.Connection:
+        """Return this thread's cached connection, opening it on first use."""
+        ident = threading.get_ident()
+        conn = conns.get(ident)
+        if conn is None:
+            conn = sqlite3.connect(str(app.config["DB_PATH"]), check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+            Database.configure(conn)
+            with conns_lock:
+                conns[ident] = conn
+        return conn
+
+    # per-thread (change key, serialized body) for /api/stats; each thread only touches its
+    # own key, so reads and writes need no lock
+    stats_cache: Dict[int, Tuple[Tuple[int, int], str]] = {}
+
+    def get_db() -> Database:
+        return Database.from_connection(_get_conn(), app.config["DB_PATH"], has_fts=has_fts)
+
+    @app.teardown_request
+    def _rollback_open_transaction(exc: Optional[BaseException]) -> None:
+        # pooled connections outlive the request, so never leak a half-done transaction
+        conn = conns.get(threading.get_ident())
+        if conn is not None and conn.in_transaction:
+            conn.rollback()
 
     @app.route("/api/books", methods=["GET"])
     def api_books():
         db = get_db()
-        books = db.get_books()
-        db.close()
-        return jsonify([b.__dict__ for b in books])
+
+        def generate():
+            # stream straight from the cursor instead of materialising every book first
+            yield "["
+            sep = ""
+            for r in db.iter_book_rows():
+                yield sep + json.dumps({"id": r[0], "title": r[1], "author": r[2], "qty": r[3]})
+                sep = ","
+            yield "]"
+
+        return Response(stream_with_context(generate()), mimetype="application/json")
 
     @app.route("/api/books", methods=["POST"])
     def api_create_book():
@@ -46,11 +90,32 @@ def create_app(db_path: Optional[Path] = None) -> Flask:
         try:
             book_id = db.add_book(payload["title"], payload["author"], qty=qty)
         except Exception as exc:
-            db.close()
             return jsonify({"error": str(exc)}), 400
-        db.close()
         return jsonify({"book_id": book_id}), 201
 
+    @app.route("/api/books/bulk", methods=["POST"])
+    def api_create_books_bulk():
+        payload = request.get_json(force=True)
+        if not isinstance(payload, list) or not payload:
+            return jsonify({"error": "expected a non-empty list of books"}), 400
+        rows = []
+        for i, item in enumerate(payload):
+            if not isinstance(item, dict) or "title" not in item or "author" not in item:
+                return jsonify({"error": f"item {i}: title and author required"}), 400
+            try:
+                qty = int(item.get("qty", 1))
+            except Exception:
+                return jsonify({"error": f"item {i}: qty must be an integer"}), 400
+            if qty < 1:
+                return jsonify({"error": f"item {i}: qty must be >= 1"}), 400
+            rows.append((item["title"], item["author"], qty))
+        db = get_db()
+        try:
+            book_ids = db.add_books_bulk(rows)
+        except Exception as exc:
+            return jsonify({"error": str(exc)}), 400
+        return jsonify({"book_ids": book_ids}), 201
+
     @app.route("/api/loan", methods=["POST"])
     def api_loan():
         payload = request.get_json(force=True)
@@ -60,9 +125,7 @@ def create_app(db_path: Optional[Path] = None) -> Flask:
         try:
             loan_id = db.loan_book(int(payload["book_id"]), payload["borrower"])
         except ValueError as exc:
-            db.close()
             return jsonify({"error": str(exc)}), 400
-        db.close()
         return jsonify({"loan_id": loan_id}), 201
 
     @app.route("/api/return", methods=["POST"])
@@ -74,9 +137,7 @@ def create_app(db_path: Optional[Path] = None) -> Flask:
         try:
             db.return_loan(int(payload["loan_id"]))
         except ValueError as exc:
-            db.close()
             return jsonify({"error": str(exc)}), 400
-        db.close()
         return jsonify({"ok": True})
 
     @app.route("/api/books/<int:book_id>", methods=["PATCH"])
@@ -88,16 +149,13 @@ def create_app(db_path: Optional[Path] = None) -> Flask:
         try:
             db.update_book(book_id, title=payload.get("title"), author_name=payload.get("author"), qty=payload.get("qty"))
         except Exception as exc:
-            db.close()
             return jsonify({"error": str(exc)}), 400
-        db.close()
         return jsonify({"ok": True})
 
     @app.route("/api/books/<int:book_id>", methods=["DELETE"])
     def api_delete_book(book_id: int):
         db = get_db()
         db.delete_book(book_id)
-        db.close()
         return jsonify({"ok": True})
 
     @app.route("/api/loans/<int:loan_id>", methods=["PATCH"])
@@ -108,36 +166,41 @@ def create_app(db_path: Optional[Path] = None) -> Flask:
         db = get_db()
         try:
             if "return_date" in payload:
-                db.return_loan(loan_id, return_date=payload.get("return_date"))
+                return_date = payload.get("return_date")
+                db.return_loan(loan_id, return_date=date.fromisoformat(return_date) if return_date else None)
             if "borrower" in payload:
                 db.conn.execute("UPDATE loans SET borrower = ? WHERE id = ?", (payload.get("borrower"), loan_id))
                 db.conn.commit()
         except ValueError as exc:
-            db.close()
             return jsonify({"error": str(exc)}), 400
-        db.close()
         return jsonify({"ok": True})
 
     @app.route("/api/loans/<int:loan_id>", methods=["DELETE"])
     def api_delete_loan(loan_id: int):
         db = get_db()
         db.delete_loan(loan_id)
-        db.close()
         return jsonify({"ok": True})
 
     @app.route("/api/stats", methods=["GET"])
     def api_stats():
         db = get_db()
-        total, avg = db.loan_aggregates()
-        counts = db.book_loan_counts()
-        db.close()
-        return jsonify({"total_loans": total, "avg_loans_per_book": avg, "top_books": [dict(book_id=b[0], title=b[1], author=b[2], times_loaned=b[3]) for b in counts]})
+        # data_version moves when another connection commits, total_changes when this one writes,
+        # so together they change on every write that could alter the stats.
+        key = (db.conn.execute("PRAGMA data_version").fetchone()[0], db.conn.total_changes)
+        ident = threading.get_ident()
+        cached = stats_cache.get(ident)
+        if cached is None or cached[0] != key:
+            total, avg = db.loan_aggregates()
+            counts = db.book_loan_counts()
+            body = json.dumps({"total_loans": total, "avg_loans_per_book": avg, "top_books": [dict(book_id=b[0], title=b[1], author=b[2], times_loaned=b[3]) for b in counts]})
+            cached = (key, body)
+            stats_cache[ident] = cached
+        return Response(cached[1], mimetype="application/json")
 
     @app.route("/", methods=["GET"])
     def index():
         db = get_db()
         books = db.get_books()
-        db.close()
         return render_template("index.html", books=books)
 
     return app